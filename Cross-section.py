@@ -1,23 +1,88 @@
 import os
 import glob
+import mmap
 import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 import pandas as pd
 
-def parse_empire_output():
-    # 1. Define Regex Patterns
-    # Matches: "Reaction ... at incident energy 1.000D+00 MeV" or "INCIDENT ENERGY 1.800D+01 MeV"
-    # We use re.IGNORECASE to handle "Incident Energy" vs "INCIDENT ENERGY"
-    energy_pattern = re.compile(r"(?:at\s+)?INCIDENT\s+ENERGY\s+([\d\.\+\-DE]+)\s+MeV", re.IGNORECASE)
-    
-    # Matches: "8-O - 16 production cross section0.559974E-02  mb"
-    # Captures the isotope name (group 1) and the value (group 2)
-    # \s* handles cases where 'section' and the number are merged
-    production_pattern = re.compile(r"^\s*(.*?)\s+production cross section\s*([\d\.\+\-DE]+)\s+mb", re.IGNORECASE)
+# 1. Define Regex Pattern (compiled once at import time)
+# A single alternation is run over the whole file buffer; the named group that
+# matched (E or P) tells us which kind of line we hit.
+#   E: "Reaction ... at incident energy 1.000D+00 MeV" or "INCIDENT ENERGY 1.800D+01 MeV"
+#   P: "8-O - 16 production cross section0.559974E-02  mb"
+#      Captures the isotope as Z, symbol and A (so "8-O - 16" can be rebuilt
+#      as "8-O-16" without any splitting) and the value; [ \t]* handles cases
+#      where 'section' and the number are merged.
+# We use re.IGNORECASE to handle "Incident Energy" vs "INCIDENT ENERGY", and
+# [ \t] instead of \s so that no match runs across a line break.
+_COMBINED_RE = re.compile(
+    rb"(?P<E>(?:at[ \t]+)?INCIDENT[ \t]+ENERGY[ \t]+([\d\.\+\-DE]+)[ \t]+MeV)"
+    rb"|(?P<P>^[ \t]*(\d+)-([A-Za-z]+)[ \t]*-[ \t]*(\d+)[ \t]+production cross section[ \t]*([\d\.\+\-DE]+)[ \t]+mb)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Fortran 'D' exponent -> Python 'E' (e.g., 1.0D+01 -> 1.0E+01) in a single pass
+_D_TABLE = str.maketrans('Dd', 'Ee')
+
+# Up to this many .out files are parsed serially; starting a process pool
+# costs more than it saves for them
+_SERIAL_MAX_FILES = 4
+
+# Parse one .out file into parallel (energies, isotopes, xs_values) lists
+def _parse_one(file_path):
+    energies, isotopes, xs_values = [], [], []
+    current_energy = None
+
+    # mmap can't map an empty file
+    if os.path.getsize(file_path) == 0:
+        return energies, isotopes, xs_values
+
+    # Map the whole file and let the regex engine stream over it; only the
+    # matched slices are ever turned into Python strings.
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for match in _COMBINED_RE.finditer(buf):
+            # --- Incident Energy Block ---
+            if match.lastgroup == 'E':
+                # Replace Fortran 'D' notation with Python 'E' (e.g., 1.0D+01 -> 1.0E+01)
+                raw_energy = match.group(2).decode('ascii', 'ignore').translate(_D_TABLE)
+                try:
+                    current_energy = float(raw_energy)
+                except ValueError:
+                    continue # Skip if energy parse fails
+                continue
+
+            # --- Production Cross Section ---
+            # Only extract if we have established a current energy context
+            if current_energy is not None:
+                # Clean up isotope name (e.g., "8-O - 16" -> "8-O-16")
+                isotope = b"-".join(match.group(4, 5, 6)).decode('ascii', 'ignore')
 
-    data_rows = []
+                raw_value = match.group(7).decode('ascii', 'ignore').translate(_D_TABLE)
+                try:
+                    xs_value = float(raw_value)
+                except ValueError:
+                    continue # Skip rather than keep a NaN, which would poison the running sums
 
-    # 2. Iterate over all .out files in the current directory
-    output_files = glob.glob("*.out")
+                energies.append(current_energy)
+                isotopes.append(isotope)
+                xs_values.append(xs_value)
+
+    return energies, isotopes, xs_values
+
+def parse_empire_output():
+    # Results are merged straight into their pivoted shape, as running
+    # sums[energy][isotope] and counts[energy][isotope] so that duplicates
+    # (e.g. several .out files at the same energy) are averaged no matter
+    # which order the files are read in
+    sums = defaultdict(lambda: defaultdict(float))
+    counts = defaultdict(lambda: defaultdict(int))
+
+    # 2. Parse all .out files in the current directory
+    output_files = sorted(glob.glob("*.out"))
     
     if not output_files:
         print("No .out files found in the current directory.")
@@ -25,62 +90,44 @@ def parse_empire_output():
 
     print(f"Found {len(output_files)} output files. Processing...")
 
-    for file_path in output_files:
-        current_energy = None
-        
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                # --- Check for Incident Energy Block ---
-                energy_match = energy_pattern.search(line)
-                if energy_match:
-                    # Replace Fortran 'D' notation with Python 'E' (e.g., 1.0D+01 -> 1.0E+01)
-                    raw_energy = energy_match.group(1).replace('D', 'E').replace('d', 'e')
-                    try:
-                        current_energy = float(raw_energy)
-                    except ValueError:
-                        continue # Skip if energy parse fails
-                    continue
-
-                # --- Check for Production Cross Section ---
-                # Only extract if we have established a current energy context
-                if current_energy is not None:
-                    prod_match = production_pattern.search(line)
-                    if prod_match:
-                        isotope_raw = prod_match.group(1).strip()
-                        # Clean up isotope name (e.g., "8-O - 16" -> "8-O-16")
-                        isotope = "-".join(isotope_raw.split()) 
-                        
-                        raw_value = prod_match.group(2).replace('D', 'E').replace('d', 'e')
-                        try:
-                            xs_value = float(raw_value)
-                            
-                            data_rows.append({
-                                'File': file_path,
-                                'Incident_Energy_MeV': current_energy,
-                                'Isotope': isotope,
-                                'Cross_Section_mb': xs_value
-                            })
-                        except ValueError:
-                            continue
+    # Every file is independent, so fan them out over a process pool (regex
+    # matching and building the per-match strings hold the GIL, so threads
+    # wouldn't help). A handful of files is parsed here instead, since the
+    # pool start-up would cost more than it saves. chunksize gives each worker
+    # about four tasks. map() keeps the sorted file order, so even the float
+    # sums come out the same on every run.
+    workers = min(len(output_files), os.cpu_count() or 1)
+    if sys.platform == 'win32':
+        # ProcessPoolExecutor rejects more than 61 workers on Windows
+        workers = min(workers, 61)
+    parallel = workers >= 2 and len(output_files) > _SERIAL_MAX_FILES
+
+    with ProcessPoolExecutor(max_workers=workers) if parallel else nullcontext() as executor:
+        if parallel:
+            chunksize = max(1, len(output_files) // (workers * 4))
+            results = executor.map(_parse_one, output_files, chunksize=chunksize)
+        else:
+            results = map(_parse_one, output_files)
+
+        # Merge each file's lists as they arrive instead of holding them all
+        for energies, isotopes, xs_values in results:
+            for energy, isotope, xs_value in zip(energies, isotopes, xs_values):
+                sums[energy][isotope] += xs_value
+                counts[energy][isotope] += 1
 
     # 3. Process Data into CSV
-    if not data_rows:
+    if not sums:
         print("No production cross-section data found.")
         return
 
-    df = pd.DataFrame(data_rows)
-
-    # Sort by Energy
-    df.sort_values(by='Incident_Energy_MeV', inplace=True)
+    # Energy as Index, Isotopes as Columns, both sorted; each cell is the
+    # mean of every value read for that energy/isotope
+    df_pivot = (
+        pd.DataFrame.from_dict(sums, orient='index') / pd.DataFrame.from_dict(counts, orient='index')
+    ).sort_index().sort_index(axis=1)
 
-    # Pivot to make it readable: Energy as Index, Isotopes as Columns
-    # We aggregate using 'max' in case of duplicates, though typically there shouldn't be 
-    # conflicting duplicates for the exact same energy/isotope in one run.
-    df_pivot = df.pivot_table(
-        index='Incident_Energy_MeV', 
-        columns='Isotope', 
-        values='Cross_Section_mb'
-    ).reset_index()
+    df_pivot.index.name = 'Incident_Energy_MeV'
+    df_pivot = df_pivot.reset_index()
 
     # 4. Save Output
     output_filename = "extracted_production_cross_sections.csv"